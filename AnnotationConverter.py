@@ -1,12 +1,21 @@
 #%%
 import pandas as pd
-import xml.etree.ElementTree as ET
+from pandas.api.types import is_integer_dtype
 import os
+from collections import defaultdict
+from itertools import count
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import json
 import numpy as np
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
+from vocParser import ET, iter_voc_elements
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 #%%
@@ -22,92 +31,131 @@ class AnnotationConverter:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
-    def voc_to_dataframe(self, directory_path: str) -> pd.DataFrame:
+    def voc_to_dataframe(self, directory_path: str, as_tables: bool = False,
+                         max_workers: Optional[int] = None) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
         """
         Converts Pascal VOC annotations from XML files in a directory to a pandas DataFrame.
 
         Args:
             directory_path (str): The path to the directory with VOC XML annotation files.
+            as_tables (bool): Return the images, annotations and categories tables separately
+                instead of one flat DataFrame.
+            max_workers (Optional[int]): Number of processes used to parse the XML files.
+                Defaults to the number of CPUs.
 
         Returns:
-            pd.DataFrame: DataFrame containing the aggregated annotations.
+            pd.DataFrame: DataFrame containing the aggregated annotations, or a dict of the
+                three tables when ``as_tables`` is set.
         """
         self.logger.info(f"Converting VOC annotations in {directory_path} to DataFrame")
 
         img_data = []
-        ann_data = []
-        cat_data = []
+        ann_image_ids = []
+        ann_category_ids = []
+        ann_category_names = []
 
         img_id = 0
-        cat_id = 0
-        categories = {}
+        # Unseen category names get the next id on first lookup, so ids follow first appearance
+        categories = defaultdict(count().__next__)
         annotation_id = 0
 
         try:
-            xml_files = [f for f in os.listdir(directory_path) if f.endswith('.xml')]
-
-            for xml_file in tqdm(xml_files, desc="Processing XML files"):
-                tree = ET.parse(os.path.join(directory_path, xml_file))
-                root = tree.getroot()
+            xml_paths = [os.path.join(directory_path, f) for f in os.listdir(directory_path) if f.lower().endswith('.xml')]
 
-                img_info = self._parse_voc_image(root, img_id)
-                img_data.append(img_info)
+            # Files are independent until ids are assigned, so parsing is spread over processes
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+                parsed_files = list(tqdm(executor.map(self._parse_voc_file, xml_paths, chunksize=32),
+                                         total=len(xml_paths), desc="Processing XML files"))
 
-                for obj in root.findall('object'):
-                    cat_name = obj.find('name').text
-                    if cat_name not in categories:
-                        categories[cat_name] = cat_id
-                        cat_data.append({
-                            'cat_id': cat_id,
-                            'cat_name': cat_name
-                        })
-                        cat_id += 1
+            # Boxes are kept in one contiguous int32 buffer rather than as a Python list per object
+            n_annotations = sum(len(ann_names) for _, ann_names, _ in parsed_files)
+            bboxes = np.empty((n_annotations, 4), dtype=np.int32)
 
-                    ann_info = self._parse_voc_annotation(obj, img_id, annotation_id, categories)
-                    ann_data.append(ann_info)
-                    annotation_id += 1
+            # Ids are assigned in a serial pass so they stay deterministic
+            for img_info, ann_names, bndboxes in parsed_files:
+                img_data.append(img_info)
+                bboxes[annotation_id:annotation_id + len(bndboxes)] = bndboxes
+                ann_image_ids.extend([img_id] * len(ann_names))
+                ann_category_names.extend(ann_names)
+                ann_category_ids.extend(map(categories.__getitem__, ann_names))
 
+                annotation_id += len(ann_names)
                 img_id += 1
 
-                img_df = pd.DataFrame(img_data)
-                ann_df = pd.DataFrame(ann_data)
-                cat_df = pd.DataFrame(cat_data)
-
-            return self._prepare_dataframe(img_df, ann_df, cat_df)
+            # Corners become [x, y, w, h] in place, and areas are read from the same buffer
+            bboxes[:, 2:] -= bboxes[:, :2]
+
+            # Sizes are parsed as ints, so they go straight into int32 columns with no later casting
+            n_images = len(img_data)
+            img_df = pd.DataFrame({
+                'img_id': np.arange(n_images, dtype=np.int32),
+                'img_width': np.fromiter((img['img_width'] for img in img_data), dtype=np.int32, count=n_images),
+                'img_height': np.fromiter((img['img_height'] for img in img_data), dtype=np.int32, count=n_images),
+                'img_image_name': [img['img_image_name'] for img in img_data],
+                'img_file_name': [img['img_file_name'] for img in img_data],
+            })
+            ann_df = pd.DataFrame({
+                'ann_id': np.arange(n_annotations, dtype=np.int32),
+                'ann_segmentation': [[] for _ in range(n_annotations)],
+                'ann_bbox': bboxes.tolist(),
+                'ann_area': np.multiply(bboxes[:, 2], bboxes[:, 3], dtype=np.int64),
+                'ann_image_id': np.asarray(ann_image_ids, dtype=np.int32),
+                'ann_category_id': np.asarray(ann_category_ids, dtype=np.int32),
+                'ann_category_name': ann_category_names,
+                'ann_iscrowd': np.zeros(n_annotations, dtype=np.int32),
+            })
+            cat_df = pd.DataFrame({
+                'cat_id': np.arange(len(categories), dtype=np.int32),
+                'cat_name': list(categories),
+            })
+
+            return self._prepare_dataframe(img_df, ann_df, cat_df, as_tables=as_tables)
         except Exception as e:
             self.logger.error(f"Error converting VOC to DataFrame: {e}")
             raise
 
+    @classmethod
+    def _parse_voc_file(cls, xml_path):
+        """Parses one VOC XML file into its image fields, object names and raw box corners."""
+        img_info = {'img_width': 0, 'img_height': 0, 'img_image_name': "", 'img_file_name': ""}
+        ann_names = []
+        bndboxes = []
+
+        try:
+            for elem in iter_voc_elements(xml_path):
+                if elem.tag == 'object':
+                    ann_names.append(elem.findtext('name'))
+                    bndboxes.append(cls._parse_voc_bndbox(elem))
+                else:
+                    cls._parse_voc_image_field(elem, img_info)
+        except ET.ParseError as e:
+            # lxml's syntax errors cannot be pickled back from a worker, so report a plain error naming the file
+            raise ValueError(f"{xml_path}: {e}") from None
+
+        return img_info, ann_names, np.array(bndboxes, dtype=np.int32).reshape(-1, 4)
+
     @staticmethod
-    def _parse_voc_image(root, img_id):
-        return {
-            'img_id': img_id,
-            'img_width': int(root.find('size/width').text),
-            'img_height': int(root.find('size/height').text),
-            'img_image_name': root.find('filename').text,
-            'img_file_name': root.find('path').text if root.find('path') is not None else ""
-        }
+    def _parse_voc_image_field(elem, img_info):
+        if elem.tag == 'size':
+            img_info['img_width'] = int(elem.findtext('width'))
+            img_info['img_height'] = int(elem.findtext('height'))
+        elif elem.tag == 'filename':
+            img_info['img_image_name'] = elem.text
+        elif elem.tag == 'path':
+            img_info['img_file_name'] = elem.text
 
     @staticmethod
-    def _parse_voc_annotation(obj, img_id, annotation_id, categories):
+    def _parse_voc_bndbox(obj):
         bndbox = obj.find('bndbox')
-        xmin = int(bndbox.find('xmin').text)
-        ymin = int(bndbox.find('ymin').text)
-        xmax = int(bndbox.find('xmax').text)
-        ymax = int(bndbox.find('ymax').text)
-
-        return {
-            'ann_id': annotation_id,
-            'ann_segmentation': [],
-            'ann_bbox': [xmin, ymin, xmax - xmin, ymax - ymin],
-            'ann_area': (xmax - xmin) * (ymax - ymin),
-            'ann_image_id': img_id,
-            'ann_category_id': categories[obj.find('name').text],
-            'ann_category_name': obj.find('name').text,
-            'ann_iscrowd': 0
-        }
-
-    def coco_to_dataframe(self, folder: str, encoding: str = "utf-8") -> pd.DataFrame:
+        return (
+            int(bndbox.findtext('xmin')),
+            int(bndbox.findtext('ymin')),
+            int(bndbox.findtext('xmax')),
+            int(bndbox.findtext('ymax'))
+        )
+
+    def coco_to_dataframe(self, folder: str, encoding: str = "utf-8",
+                          as_tables: bool = False) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
         self.logger.info(f"Converting COCO annotations in folder {folder} to DataFrame")
 
         image_id_offset = 0
@@ -121,11 +169,10 @@ class AnnotationConverter:
         category_names_set = set()
 
         try:
-            json_files = [os.path.join(folder, f) for f in os.listdir(folder) if f.endswith('.json')]
+            json_files = [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith('.json')]
 
-            for json_file in tqdm(json_files, desc="Processing XML files"):
-                with open(json_file, encoding=encoding) as cocojson:
-                    annotations_json = json.load(cocojson)
+            for json_file in tqdm(json_files, desc="Processing JSON files"):
+                annotations_json = self._load_json(json_file, encoding=encoding)
 
                 # Update image IDs to avoid conflicts
                 last_image_id = 0
@@ -143,35 +190,34 @@ class AnnotationConverter:
                 image_id_offset = last_image_id +1
                 annotation_id_offset = last_annotation_id +1
 
-                images = pd.json_normalize(annotations_json["images"]).add_prefix("img_")
-                annotations = pd.json_normalize(annotations_json["annotations"]).add_prefix("ann_")
-
-                all_images.append(images)
-                all_annotations.append(annotations)
+                all_images.extend(annotations_json["images"])
+                all_annotations.extend(annotations_json["annotations"])
 
                 # Add unique categories
                 for category in annotations_json["categories"]:
                     if category["name"] not in category_names_set:
                         category_names_set.add(category["name"])
-                        categories = pd.json_normalize([category]).add_prefix("cat_")
-                        all_categories.append(categories)
+                        all_categories.append(category)
 
-            # Concatenate all DataFrames
-            images_df = pd.concat(all_images, ignore_index=True)
-            categories_df = pd.concat(all_categories, ignore_index=True)
-            annotations_df = pd.concat(all_annotations, ignore_index=True)
+            # Records from every file are gathered first so each table is built once, without pd.concat.
+            # COCO records are flat, so they are loaded as-is rather than walked by json_normalize
+            images_df = pd.DataFrame.from_records(all_images).add_prefix("img_")
+            categories_df = pd.DataFrame.from_records(all_categories).add_prefix("cat_")
+            annotations_df = pd.DataFrame.from_records(all_annotations).add_prefix("ann_")
 
-            return self._prepare_dataframe(images_df, annotations_df, categories_df)
+            return self._prepare_dataframe(images_df, annotations_df, categories_df, as_tables=as_tables)
         except Exception as e:
             self.logger.error(f"Error converting COCO to DataFrame: {e}")
             raise
 
-    def _prepare_dataframe(self, images_df, annotations_df, categories_df):
+    def _prepare_dataframe(self, images_df, annotations_df, categories_df, as_tables=False):
+        # Parsed VOC sizes and COCO ids are already integer columns; only clean up the ones that are not
         for col in ["img_width", "img_height"]:
-            if col in images_df.columns:
+            if col in images_df.columns and not is_integer_dtype(images_df[col]):
                 images_df[col] = images_df[col].astype("int64", errors='ignore').replace("", 0).fillna(0)
 
-        categories_df["cat_id"] = pd.to_numeric(categories_df["cat_id"]).fillna(0).astype(int)
+        if not is_integer_dtype(categories_df["cat_id"]):
+            categories_df["cat_id"] = pd.to_numeric(categories_df["cat_id"]).fillna(0).astype(int)
 
         # Handling error
         annotations_df["ann_category_id"] = annotations_df["ann_category_id"].astype(str)
@@ -180,100 +226,128 @@ class AnnotationConverter:
         images_df.fillna("", inplace=True)
         categories_df.index.name = "id"
 
-        df = pd.concat([images_df, annotations_df, categories_df], axis=1)
-        df = df.reindex(columns=self.schema, fill_value="")
-
-        return df
+        if as_tables:
+            tables = {"images": images_df, "annotations": annotations_df, "categories": categories_df}
+            for name, prefix in (("images", "img_"), ("annotations", "ann_"), ("categories", "cat_")):
+                schema_columns = [col for col in self.schema if col.startswith(prefix)]
+                tables[name] = tables[name].reindex(columns=schema_columns, fill_value="")
+            return tables
+
+        # Assemble the schema column by column; shorter tables are padded with NaN by position
+        n_rows = max(len(images_df), len(annotations_df), len(categories_df))
+        columns = {}
+        for table in (images_df, annotations_df, categories_df):
+            for col in table.columns.intersection(self.schema):
+                values = table[col].to_numpy()
+                if len(values) < n_rows:
+                    padded = np.full(n_rows, np.nan, dtype=np.float64 if values.dtype.kind in "iuf" else object)
+                    padded[:len(values)] = values
+                    values = padded
+                columns[col] = values
+
+        return pd.DataFrame({col: columns.get(col, "") for col in self.schema}, index=pd.RangeIndex(n_rows))
 
     def dataframe_to_bina_coco(self, dataframe, output_path=None, cat_id_index=None):
         """
         Writes COCO annotation files to disk (in JSON format) and returns the path to files.
+
+        ``dataframe`` is either the flat frame returned by the converters or the dict of
+        images/annotations/categories tables they return with ``as_tables=True``.
         """
         self.logger.info(f"Converting dataframe to bina_coco and saving it in {output_path}")
 
-        df = dataframe.copy(deep=True)
-        df = df.replace(r"^\s*$", np.nan, regex=True)
-
-        df["ann_iscrowd"] = df["ann_iscrowd"].fillna(0)
-
-        df_outputI = []
-        df_outputA = []
-        df_outputC = []
-
-        pbar = tqdm(desc="Exporting to COCO file...", total=df.shape[0])
-        for i in range(0, df.shape[0]):
-            if not pd.isna(df["img_id"][i]):
-                images = [
-                    {
-                        "id": int(df["img_id"][i]),
-                        "width": df["img_width"][i],
-                        "height": df["img_height"][i],
-                        "image_name": df["img_file_name"][i],
-                        "file_name": df["img_file_name"][i],
-                    }
-                ]
-                df_outputI.append(pd.DataFrame([images]))
-
-            if not pd.isna(df["cat_id"][i]):
-                categories = [
-                    {
-                        "id": int(df["cat_id"][i]),
-                        "name": df["cat_name"][i],
-                        "supercategory": df["cat_supercategory"][i],
-                    }
-                ]
-                df_outputC.append(pd.DataFrame([categories]))
-
-            if not pd.isna(df["ann_id"][i]):
-                annotations = [
-                    {
-                        "id": int(df["ann_id"][i]),
-                        "segmentation": df["ann_segmentation"][i],
-                        "image_id": int(df["ann_image_id"][i]),
-                        "category_id": int(df["ann_category_id"][i]),
-                        "area": df["ann_area"][i],
-                        "bbox": df["ann_bbox"][i],
-                        "iscrowd": df["ann_iscrowd"][i],
-                    }
-                ]
-                df_outputA.append(pd.DataFrame([annotations]))
-
+        tables = dataframe if isinstance(dataframe, dict) else self._split_tables(dataframe)
+
+        with tqdm(desc="Exporting to COCO file...", total=3) as pbar:
+            img_sub = tables["images"]
+            img_sub = img_sub.astype({"img_id": int}).assign(img_image_name=img_sub["img_file_name"])
+            images = self._to_records(img_sub, {
+                "img_id": "id",
+                "img_width": "width",
+                "img_height": "height",
+                "img_image_name": "image_name",
+                "img_file_name": "file_name",
+            })
             pbar.update()
 
-        mergedI = pd.concat(df_outputI, ignore_index=True)
-        mergedA = pd.concat(df_outputA, ignore_index=True)
-        mergedC = pd.concat(df_outputC, ignore_index=True)
-
-        resultI = mergedI[0].to_json(orient="split", default_handler=str)
-        resultA = mergedA[0].to_json(orient="split", default_handler=str)
-        resultC = mergedC[0].to_json(orient="split", default_handler=str)
+            cat_sub = tables["categories"].astype({"cat_id": int})
+            categories = self._to_records(cat_sub, {
+                "cat_id": "id",
+                "cat_name": "name",
+                "cat_supercategory": "supercategory",
+            })
+            pbar.update()
 
-        parsedI = json.loads(resultI)
-        parsedA = json.loads(resultA)
-        parsedC = json.loads(resultC)
+            ann_columns = {
+                "ann_id": "id",
+                "ann_segmentation": "segmentation",
+                "ann_image_id": "image_id",
+                "ann_category_id": "category_id",
+                "ann_area": "area",
+                "ann_bbox": "bbox",
+                "ann_iscrowd": "iscrowd",
+            }
+            ann_sub = tables["annotations"]
+            ann_sub = ann_sub.astype({"ann_id": int, "ann_image_id": int, "ann_category_id": int})
+            ann_sub = ann_sub.assign(ann_iscrowd=ann_sub["ann_iscrowd"].replace("", 0).fillna(0))
+            annotations = self._to_records(ann_sub, ann_columns)
+            pbar.update()
 
-        parsedI.update({
+        json_output = {
             "info": {},
-            "images": parsedI.pop("data"),
-            "categories": parsedC.pop("data"),
+            "images": images,
+            "categories": categories,
             "licenses": [],
             "errors": [],
-            "annotations": parsedA.pop("data"),
+            "annotations": annotations,
             "labels": [],
             "classifications": [],
             "augmentation_settings": {},
             "tile_settings": {},
             "False_positive": {}
-        })
-        del parsedI["index"]
-        del parsedI["name"]
-
-        json_output = parsedI
+        }
 
-        with open(output_path, "w") as outfile:
-            json.dump(obj=json_output, fp=outfile, indent=4)
+        self._dump_json(json_output, output_path)
         return [str(output_path)]
 
+    @staticmethod
+    def _load_json(path, encoding="utf-8"):
+        """Loads a JSON file, parsing it with orjson when it is installed; ``encoding`` only applies to the json fallback."""
+        if orjson is not None:
+            # orjson parses UTF-8 bytes directly, so the file is not decoded to str first
+            with open(path, "rb") as json_file:
+                return orjson.loads(json_file.read())
+        with open(path, encoding=encoding) as json_file:
+            return json.load(json_file)
+
+    @staticmethod
+    def _dump_json(obj, path):
+        """Writes ``obj`` as JSON, serializing it with orjson when it is installed."""
+        if orjson is not None:
+            with open(path, "wb") as outfile:
+                outfile.write(orjson.dumps(obj, default=str, option=orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            with open(path, "w") as outfile:
+                json.dump(obj=obj, fp=outfile, default=str)
+
+    @staticmethod
+    def _split_tables(dataframe):
+        """Splits a flat annotation frame into the rows and columns of its images, annotations and categories."""
+        tables = {}
+        for name, id_col in (("images", "img_id"), ("annotations", "ann_id"), ("categories", "cat_id")):
+            prefix = id_col[:id_col.index("_") + 1]
+            # Rows without an id (NaN padding or blank cells) do not belong to this table
+            ids = dataframe[id_col]
+            columns = [col for col in dataframe.columns if col.startswith(prefix)]
+            tables[name] = dataframe.loc[ids.notna() & ids.ne(""), columns]
+        return tables
+
+    @staticmethod
+    def _to_records(sub_df, columns):
+        """Renames ``sub_df`` to COCO field names and returns its rows as dicts, with NaN and "" mapped to None."""
+        sub_df = sub_df[list(columns)].rename(columns=columns).astype(object)
+        return sub_df.where(sub_df.notna() & sub_df.ne(""), None).to_dict(orient="records")
+
 #%%
 # Example usage
 # directory_path = 'converted_CarLicencePlate.zip/annotations/coco'
@@ -1,7 +1,7 @@
 #%%
 import shutil
 
-from AnnotationExplorer import AnnotationExplorer
+from annotationExplorer import AnnotationExplorer
 from AnnotationConverter import AnnotationConverter
 import os
 
@@ -14,14 +14,13 @@ def explore_and_convert(zip_path):
 
     if explorer.identified_format == 'Pascal VOC':
         xml_path = os.path.join(explorer.annotations_dir, 'xml')
-        voc_df = converter.voc_to_dataframe(xml_path)
-        converter.dataframe_to_bina_coco(voc_df, output_path=output_path)
+        voc_tables = converter.voc_to_dataframe(xml_path, as_tables=True)
+        converter.dataframe_to_bina_coco(voc_tables, output_path=output_path)
         
     elif explorer.identified_format == 'COCO':
         coco_path = os.path.join(explorer.annotations_dir, 'coco')
-        coco_df = converter.coco_to_dataframe(coco_path)
-        # coco_df.to_csv('mine.csv', index=False)
-        converter.dataframe_to_bina_coco(coco_df, output_path=output_path)
+        coco_tables = converter.coco_to_dataframe(coco_path, as_tables=True)
+        converter.dataframe_to_bina_coco(coco_tables, output_path=output_path)
         
     #TODO Yolo converter is not written yet
     elif explorer.identified_format == 'YOLO':
@@ -38,4 +37,5 @@ def delete_folder(output_path):
         shutil.rmtree(output_path)
 
 #%%
-explore_and_convert(zip_path = "Example Datasets/empty.zip")
\ No newline at end of file
+if __name__ == "__main__":
+    explore_and_convert(zip_path = "Example Datasets/empty.zip")
\ No newline at end of file
@@ -5,11 +5,27 @@ import zipfile
 import os
 import shutil
 import json
-import xml.etree.ElementTree as ET
 import logging
+import re
 import pandas as pd
-from typing import Tuple, Optional, Dict, List
+from typing import BinaryIO, Tuple, Optional, Dict, List, Set
+from vocParser import ET, iter_voc_elements
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Errors that mean a .json file is not parseable, whichever parser is in use
+_JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError) if ijson is not None else (json.JSONDecodeError,)
+
+# A YOLO label line: integer class id followed by four normalized box coordinates
+_YOLO_LINE_RE = re.compile(rb'^\s*\d+(?:\s+-?\d*\.?\d+){4}\s*$')
 
 
 class AnnotationExplorer:
@@ -17,10 +33,15 @@ class AnnotationExplorer:
         self.zip_path: str = zip_path
         # Create the folder structure and get the base directory and other paths
         self.base_dir, self.train_images_dir, self.cocos_dir, self.annotations_dir = self._create_folder_structure()
-        self.extract_dir: str = "extracted_files"
         self.identified_format: Optional[str] = None
         self.num_images: int = 0
         self.num_annotations: int = 0
+        # Extension -> (format check, format name); a file only ever goes through the check for its extension
+        self._format_checks = {
+            '.xml': (self._is_pascal_voc, 'Pascal VOC'),
+            '.txt': (self._is_yolo, 'YOLO'),
+            '.json': (self._is_coco, 'COCO'),
+        }
 
         # Setup logging
         logging.basicConfig(level=logging.INFO)
@@ -72,109 +93,125 @@ class AnnotationExplorer:
 
         return base_dir, train_images_dir, cocos_dir, annotations_dir
 
-    def extract_zip(self) -> None:
-        """Extracts the zip file to a temporary directory."""
-        os.makedirs(self.extract_dir, exist_ok=True)
-        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
-            zip_ref.extractall(self.extract_dir)
-        self.logger.info(f"Extracted zip file to {self.extract_dir}")
-
     def organize_files_and_identify_format(self) -> None:
-        """Identifies the annotation format and organizes files into separate folders."""
+        """Identifies the annotation format and writes the zip's files into separate folders."""
         annotations_dir = self.annotations_dir
         images_dir = self.train_images_dir
 
-        for root, _, files in os.walk(self.extract_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                    shutil.move(file_path, os.path.join(images_dir, file))
+        image_extensions = {'.png', '.jpg', '.jpeg'}
+        format_folders = {
+            'Pascal VOC': os.path.join(annotations_dir, 'xml'),
+            'YOLO': os.path.join(annotations_dir, 'yolo'),
+            'COCO': os.path.join(annotations_dir, 'coco'),
+        }
+        # Destination folders are created once up front, and the names already used in each are
+        # tracked in memory so collision checks do not stat the disk for every file
+        taken_names = {}
+        for folder in format_folders.values():
+            os.makedirs(folder, exist_ok=True)
+            taken_names[folder] = set(os.listdir(folder))
+
+        # Members are classified straight from the archive and only the ones that are kept get written
+        with zipfile.ZipFile(self.zip_path, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                if info.is_dir():
+                    continue
+
+                file_name = os.path.basename(info.filename)
+                extension = os.path.splitext(file_name)[1].lower()
+                if extension in image_extensions:
+                    self._write_member(zip_ref, info, os.path.join(images_dir, file_name))
                     self.num_images += 1
-                elif file.endswith('.xml'):
-                    if self._is_pascal_voc(file_path):
-                        self._move_file(file_path, os.path.join(annotations_dir, 'xml'))
-                        self.identified_format = 'Pascal VOC'
-                        self.num_annotations += 1
-                elif file.endswith('.txt'):
-                    if self._is_yolo(file_path):
-                        self._move_file(file_path, os.path.join(annotations_dir, 'yolo'))
-                        self.identified_format = 'YOLO'
-                        self.num_annotations += 1
-                elif file.endswith('.json'):
-                    if self._is_coco(file_path):
-                        self._move_file(file_path, os.path.join(annotations_dir, 'coco'))
-                        self.identified_format = 'COCO'
-                        self.num_annotations += 1
-
-        self.logger.info(f"Moved and Organized files, the identified format is: {self.identified_format}")
-
-    def _move_file(self, file_path: str, destination_folder: str) -> None:
-        """Moves a file to the specified destination folder, renaming the file if necessary to avoid collisions."""
-        os.makedirs(destination_folder, exist_ok=True)
-
-        file_name = os.path.basename(file_path)
-        destination_path = os.path.join(destination_folder, file_name)
+                    continue
+
+                annotation_format = self._detect_format(zip_ref, info)
+                if annotation_format is not None:
+                    destination_folder = format_folders[annotation_format]
+                    self._extract_file(zip_ref, info, destination_folder, taken_names[destination_folder])
+                    self.identified_format = annotation_format
+                    self.num_annotations += 1
+
+        self.logger.info(f"Extracted and Organized files, the identified format is: {self.identified_format}")
+
+    def _detect_format(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo) -> Optional[str]:
+        """Returns the annotation format of a zip member, or None if it matches none."""
+        format_check = self._format_checks.get(os.path.splitext(info.filename)[1].lower())
+        if format_check is None:
+            return None
+        is_format, annotation_format = format_check
+        with zip_ref.open(info) as file:
+            return annotation_format if is_format(file) else None
+
+    def _extract_file(self, zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, destination_folder: str,
+                      taken_names: Set[str]) -> None:
+        """Extracts a zip member to the specified destination folder, renaming the file if necessary to avoid collisions."""
+        file_name = os.path.basename(info.filename)
         base, extension = os.path.splitext(file_name)
         counter = 1
 
-        while os.path.exists(destination_path):
-            new_file_name = f"{base}_{counter}{extension}"
-            destination_path = os.path.join(destination_folder, new_file_name)
+        while file_name in taken_names:
+            file_name = f"{base}_{counter}{extension}"
             counter += 1
 
-        shutil.move(file_path, destination_path)
+        taken_names.add(file_name)
+        self._write_member(zip_ref, info, os.path.join(destination_folder, file_name))
+
+    @staticmethod
+    def _write_member(zip_ref: zipfile.ZipFile, info: zipfile.ZipInfo, destination_path: str) -> None:
+        """Streams a zip member directly to its destination path."""
+        with zip_ref.open(info) as source, open(destination_path, 'wb') as destination:
+            shutil.copyfileobj(source, destination)
+
+    def _is_pascal_voc(self, file: BinaryIO) -> bool:
+        """Checks if the binary file object holds a Pascal VOC XML annotation."""
+        # Cheap byte sniff first: a VOC root element opens within the first few KB of the file
+        if b'<annotation' not in file.read(4096):
+            return False
+        file.seek(0)
 
-    def _is_pascal_voc(self, file_path: str) -> bool:
-        """Checks if the file is a Pascal VOC XML annotation."""
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            if root.tag == 'annotation' and root.find('object') is not None:
-                return True
+            # Stream the document and stop once the first <object> under the <annotation> root is complete
+            for elem in iter_voc_elements(file, root_tag='annotation'):
+                if elem.tag == 'object':
+                    return True
         except ET.ParseError:
             pass
         return False
 
-    def _is_yolo(self, file_path: str) -> bool:
-        """Checks if the file is a YOLO annotation."""
+    def _is_yolo(self, file: BinaryIO) -> bool:
+        """Checks if the binary file object holds a YOLO annotation."""
         try:
-            with open(file_path, 'r') as file:
-                lines = file.readlines()
-                for line in lines:
-                    parts = line.strip().split()
-                    if len(parts) == 5 and all(part.replace('.', '', 1).isdigit() for part in parts):
-                        return True
+            # YOLO files are homogeneous, so the first non-blank line decides
+            for line in file:
+                if line.strip():
+                    return bool(_YOLO_LINE_RE.match(line))
         except Exception:
             pass
         return False
 
-    def _is_coco(self, file_path: str) -> bool:
-        """Checks if the file is a COCO JSON annotation."""
+    def _is_coco(self, file: BinaryIO) -> bool:
+        """Checks if the binary file object holds a COCO JSON annotation."""
         try:
-            with open(file_path, 'r') as file:
-                data = json.load(file)
-                if 'annotations' in data and 'images' in data and 'categories' in data:
-                    return True
-        except json.JSONDecodeError:
+            if ijson is not None:
+                # Stream the top-level keys and stop once the COCO ones are seen, without loading the file
+                seen_keys = set()
+                for prefix, event, value in ijson.parse(file):
+                    if prefix == '' and event == 'map_key':
+                        seen_keys.add(value)
+                        if {'annotations', 'images', 'categories'} <= seen_keys:
+                            return True
+                return False
+
+            data = orjson.loads(file.read()) if orjson is not None else json.load(file)
+            if 'annotations' in data and 'images' in data and 'categories' in data:
+                return True
+        except _JSON_ERRORS:
             pass
         return False
 
-    def cleanup(self) -> None:
-        """Cleans up the extracted files while keeping organized images and annotations folders."""
-        for root, dirs, files in os.walk(self.extract_dir, topdown=False):
-            for file in files:
-                os.remove(os.path.join(root, file))
-            for dir in dirs:
-                shutil.rmtree(os.path.join(root, dir))
-        if os.path.exists(self.extract_dir):
-            os.rmdir(self.extract_dir)
-        self.logger.info(f"Cleaned up extracted files in {self.extract_dir}")
-
     def explore_and_organize(self) -> Dict[str, Optional[str]]:
-        """Main method to extract, organize, identify format, and cleanup."""
-        self.extract_zip()
+        """Main method to extract, organize and identify format."""
         self.organize_files_and_identify_format()
-        self.cleanup()
         return {
             'dataset_name': os.path.basename(self.zip_path),
             'annotation_format': self.identified_format,
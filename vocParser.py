@@ -0,0 +1,35 @@
+#%%
+from typing import Optional
+
+try:
+    from lxml import etree as ET
+    # VOC files never use xml:id and their whitespace-only text nodes are never read
+    _ITERPARSE_OPTIONS = {'remove_blank_text': True, 'collect_ids': False}
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _ITERPARSE_OPTIONS = {}
+
+
+def iter_voc_elements(source, root_tag: Optional[str] = None):
+    """
+    Streams the top-level children of a VOC XML document, dropping each one once it has been consumed.
+
+    Args:
+        source: A path or binary file object holding the XML document.
+        root_tag (Optional[str]): When given, nothing is yielded unless the root element has this tag.
+    """
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(source, events=('start', 'end'), **_ITERPARSE_OPTIONS):
+        if event == 'start':
+            if root is None:
+                if root_tag is not None and elem.tag != root_tag:
+                    return
+                root = elem
+            depth += 1
+            continue
+        depth -= 1
+        if depth == 1:
+            yield elem
+            # Consumed children are always first, so detaching them keeps the tree from growing
+            root.remove(elem)